@@ -23,11 +23,9 @@ export default function LoginPage() {
       try {
         const symbols = ['BTC-USD', 'SPY', 'ETH-USD'];
         const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-        const results = await Promise.all(
-          symbols.map(sym =>
-            fetch(`${API_URL}/stocks/price/${sym}`).then(res => res.json())
-          )
-        );
+        const res = await fetch(`${API_URL}/stocks/prices?symbols=${symbols.join(',')}&fields=price,change_percent`);
+        const data = await res.json();
+        const results: { symbol: string; price: number; change_percent: number }[] = data.quotes;
 
         const newTickers = results.map(data => {
           const change = data.change_percent ? parseFloat(data.change_percent) : 0;
@@ -0,0 +1,20 @@
+import sqlite3
+
+# Connect to the SQLite database
+# Adjust path if running from different location
+try:
+    conn = sqlite3.connect('sql_app.db')
+    cursor = conn.cursor()
+
+    # Attempt to add the refreshed_at column
+    print("Attempting to add 'refreshed_at' column to 'portfolios' table...")
+    cursor.execute("ALTER TABLE portfolios ADD COLUMN refreshed_at DATETIME")
+    print("Column 'refreshed_at' added successfully.")
+    
+    conn.commit()
+    conn.close()
+except sqlite3.OperationalError as e:
+    # Error thrown if column likely already exists
+    print(f"Operation failed (column might already exist): {e}")
+except Exception as e:
+    print(f"An unexpected error occurred: {e}")
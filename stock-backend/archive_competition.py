@@ -0,0 +1,44 @@
+"""
+Archive a finished competition.
+
+Freezes its final standings and holdings into archived_standings, serves its
+leaderboard from there, and deletes its live portfolios and items.
+Refresh prices first (force_update_prices.py) if the final values should be current.
+
+Usage: python archive_competition.py <competition id or slug>
+"""
+import sys
+from database import SessionLocal, engine, Base
+import crud
+import models
+
+if len(sys.argv) != 2:
+    print(__doc__)
+    sys.exit(1)
+
+# Make sure the archived_standings table exists
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+key = sys.argv[1]
+query = db.query(models.Competition)
+if key.isdigit():
+    comp = query.filter(models.Competition.id == int(key)).first()
+else:
+    comp = query.filter(models.Competition.slug == key).first()
+
+if not comp:
+    print(f"Competition '{key}' not found.")
+    db.close()
+    sys.exit(1)
+
+print(f"Archiving competition {comp.id} ({comp.name})...")
+try:
+    count = crud.archive_competition(db, comp.id)
+    print(f"Archived {count} portfolios. Live rows pruned.")
+except ValueError as e:
+    print(f"Not archived: {e}")
+    db.close()
+    sys.exit(1)
+
+db.close()
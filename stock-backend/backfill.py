@@ -0,0 +1,214 @@
+"""
+Historical price backfill.
+
+Sets each portfolio item's cost basis (initial_price) to the daily close at its
+competition's entry_deadline, then recomputes every portfolio's totals.
+Daily bars are downloaded for all needed symbols in one batch and kept in the
+price_bars table, so re-runs only download what is missing and --offline works
+entirely from the local store.
+
+Usage:
+    python backfill.py            # download missing bars, then apply
+    python backfill.py --offline  # apply from stored bars only
+"""
+import argparse
+from datetime import datetime, timedelta, time as dtime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+import ranking
+import crud
+
+# How far before a deadline to look for the last trading day (weekends, holidays)
+LOOKBACK_DAYS = 7
+
+# Daily bars are dated by the exchange's session; a bar's close is final at 16:00 New York time
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_CLOSE = dtime(16, 0)
+
+
+def deadline_cutoff(deadline: datetime):
+    """
+    Date of the last session close at or before the deadline (stored as naive UTC).
+    That is the deadline's own day in New York only if it falls after the close,
+    otherwise the day before; a midnight UTC deadline (the default) is the
+    previous evening in New York. close_at() then skips back over non-trading days.
+    """
+    local = deadline.replace(tzinfo=timezone.utc).astimezone(MARKET_TIMEZONE)
+    if local.time() >= MARKET_CLOSE:
+        return local.date()
+    return local.date() - timedelta(days=1)
+
+
+def closed_competitions(db: Session):
+    now = datetime.utcnow()
+    return db.query(models.Competition)\
+             .filter(models.Competition.entry_deadline.isnot(None))\
+             .filter(models.Competition.entry_deadline < now).all()
+
+
+def needed_bars(db: Session, competitions):
+    """Return {symbol: set of cutoff dates} for items in the given competitions."""
+    cutoffs = {c.id: deadline_cutoff(c.entry_deadline) for c in competitions}
+    if not cutoffs:
+        return {}
+    rows = db.query(models.PortfolioItem.symbol, models.Portfolio.competition_id)\
+             .join(models.Portfolio, models.Portfolio.id == models.PortfolioItem.portfolio_id)\
+             .filter(models.Portfolio.competition_id.in_(list(cutoffs)))\
+             .distinct().all()
+    needed = {}
+    for symbol, competition_id in rows:
+        needed.setdefault(symbol, set()).add(cutoffs[competition_id])
+    return needed
+
+
+def load_bars(db: Session, symbols, start, end):
+    """Return {symbol: {date: close}} from the local store."""
+    if not symbols:
+        return {}
+    rows = db.query(models.PriceBar.symbol, models.PriceBar.date, models.PriceBar.close)\
+             .filter(models.PriceBar.symbol.in_(list(symbols)))\
+             .filter(models.PriceBar.date >= start, models.PriceBar.date <= end).all()
+    bars = {}
+    for symbol, date, close in rows:
+        bars.setdefault(symbol, {})[date] = close
+    return bars
+
+
+def close_at(bars: dict, cutoff):
+    """Latest close on or before cutoff, within LOOKBACK_DAYS."""
+    for offset in range(LOOKBACK_DAYS + 1):
+        close = bars.get(cutoff - timedelta(days=offset))
+        if close is not None:
+            return close
+    return None
+
+
+def download_bars(db: Session, symbols, start, end):
+    """Fetch daily closes for all symbols in a single yfinance call and store new ones."""
+    import yfinance as yf
+
+    symbols = sorted(symbols)
+    if not symbols:
+        return 0
+    print(f"Downloading daily bars for {len(symbols)} symbols ({start} to {end})...")
+    data = yf.download(symbols, start=start, end=end + timedelta(days=1), interval="1d",
+                       auto_adjust=False, progress=False, threads=True)
+    if data is None or data.empty:
+        print("  No data returned.")
+        return 0
+
+    closes = data["Close"]
+    if not hasattr(closes, "columns"):
+        # Older yfinance returns a plain Series for a single symbol
+        closes = closes.to_frame(name=symbols[0])
+
+    existing = load_bars(db, symbols, start, end)
+    new_bars = []
+    for symbol in closes.columns:
+        stored = existing.get(symbol, {})
+        for ts, close in closes[symbol].dropna().items():
+            day = ts.date()
+            if day not in stored:
+                new_bars.append({"symbol": symbol, "date": day, "close": float(close)})
+
+    if new_bars:
+        db.bulk_insert_mappings(models.PriceBar, new_bars)
+        db.commit()
+    print(f"  Stored {len(new_bars)} new bars.")
+    return len(new_bars)
+
+
+def recompute_portfolios(db: Session):
+    """Recompute total_value and total_return_percent for every portfolio with one aggregate query."""
+    totals = db.query(
+        models.PortfolioItem.portfolio_id,
+        func.sum(models.PortfolioItem.initial_price * models.PortfolioItem.quantity),
+        func.sum(models.PortfolioItem.current_price * models.PortfolioItem.quantity),
+    ).group_by(models.PortfolioItem.portfolio_id).all()
+
+    updates = []
+    for portfolio_id, initial_total, current_total in totals:
+        initial_total = initial_total or 0.0
+        current_total = current_total or 0.0
+        if initial_total > 0:
+            total_return_percent = ((current_total - initial_total) / initial_total) * 100
+        else:
+            total_return_percent = 0.0
+        updates.append({"id": portfolio_id, "total_value": current_total, "total_return_percent": total_return_percent})
+
+    db.bulk_update_mappings(models.Portfolio, updates)
+    db.commit()
+    return len(updates)
+
+
+def run_backfill(db: Session, offline: bool = False):
+    competitions = closed_competitions(db)
+    needed = needed_bars(db, competitions)
+    if not needed:
+        print("No items in closed competitions. Nothing to backfill.")
+        return {"bars_downloaded": 0, "items_updated": 0, "items_missing": 0, "portfolios_recomputed": 0}
+
+    all_cutoffs = [d for dates in needed.values() for d in dates]
+    start = min(all_cutoffs) - timedelta(days=LOOKBACK_DAYS)
+    end = max(all_cutoffs)
+
+    bars = load_bars(db, needed, start, end)
+    missing = [s for s, dates in needed.items() if any(close_at(bars.get(s, {}), d) is None for d in dates)]
+
+    downloaded = 0
+    if missing and not offline:
+        downloaded = download_bars(db, missing, start, end)
+        bars = load_bars(db, needed, start, end)
+    elif missing:
+        print(f"Offline: {len(missing)} symbols have no stored bar at their deadline.")
+
+    # Apply cost basis per competition
+    updated = 0
+    unresolved = 0
+    for comp in competitions:
+        cutoff = deadline_cutoff(comp.entry_deadline)
+        items = db.query(models.PortfolioItem)\
+                  .join(models.Portfolio, models.Portfolio.id == models.PortfolioItem.portfolio_id)\
+                  .filter(models.Portfolio.competition_id == comp.id).all()
+        for item in items:
+            close = close_at(bars.get(item.symbol, {}), cutoff)
+            if close is None:
+                unresolved += 1
+                continue
+            if item.initial_price != close:
+                item.initial_price = close
+                updated += 1
+            if not item.current_price:
+                item.current_price = close
+        db.commit()
+
+    recomputed = recompute_portfolios(db)
+    ranking.invalidate()
+    for comp in competitions:
+        crud.invalidate_leaderboard(comp.id)
+
+    print(f"Updated {updated} items, {unresolved} without a bar, recomputed {recomputed} portfolios.")
+    return {
+        "bars_downloaded": downloaded,
+        "items_updated": updated,
+        "items_missing": unresolved,
+        "portfolios_recomputed": recomputed,
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine, Base
+
+    parser = argparse.ArgumentParser(description="Backfill cost basis from deadline closes.")
+    parser.add_argument("--offline", action="store_true", help="Use only bars already in the local store")
+    args = parser.parse_args()
+
+    # Make sure the price_bars table exists
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        run_backfill(db, offline=args.offline)
+    finally:
+        db.close()
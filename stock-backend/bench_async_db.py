@@ -0,0 +1,121 @@
+"""
+Benchmark: sync Session vs AsyncSession under concurrent requests.
+
+Builds a small app with two equivalent endpoints against the configured database
+(DATABASE_URL, or the local SQLite file): a sync `def` route on a sync Session,
+which runs in the threadpool, and an `async def` route on an AsyncSession.
+Each request runs one query that waits --latency seconds in the database,
+to stand in for the round trip to Postgres.
+
+Usage: python bench_async_db.py [--requests 400] [--concurrency 10,50,200] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+import database
+
+# Large enough that connections aren't the bottleneck for either variant
+POOL_SIZE = 250
+
+
+def sleep_sql(url):
+    if url.drivername.startswith("postgresql"):
+        return text("SELECT pg_sleep(:s)")
+    return text("SELECT sleep(:s)")
+
+
+def add_sqlite_sleep(sync_engine):
+    # SQLite has no sleep(); register one so both drivers can simulate latency
+    @event.listens_for(sync_engine, "connect")
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep", 1, lambda s: time.sleep(s) or 0)
+
+
+def build_app(latency: float):
+    sync_url = make_url(database.DATABASE_URL or database.SQLALCHEMY_DATABASE_URL)
+    async_url = database.async_database_url(str(sync_url))
+
+    if sync_url.drivername.startswith("sqlite"):
+        sync_engine = create_engine(sync_url, connect_args={"check_same_thread": False},
+                                    pool_size=POOL_SIZE, max_overflow=0)
+        async_engine = create_async_engine(async_url, pool_size=POOL_SIZE, max_overflow=0)
+        add_sqlite_sleep(sync_engine)
+        add_sqlite_sleep(async_engine.sync_engine)
+    else:
+        sync_engine = create_engine(sync_url, pool_size=POOL_SIZE, max_overflow=0)
+        async_engine = create_async_engine(async_url, pool_size=POOL_SIZE, max_overflow=0)
+
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+    AsyncSessionBench = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    query = sleep_sql(sync_url)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionBench() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_route(db: Session = Depends(get_sync_db)):
+        db.execute(query, {"s": latency})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(query, {"s": latency})
+        return {"ok": True}
+
+    return app, sync_engine, async_engine
+
+
+async def hammer(client, path, total, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            r = await client.get(path)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", default="10,50,200")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    app, sync_engine, async_engine = build_app(args.latency)
+    transport = httpx.ASGITransport(app=app)
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms simulated query latency")
+    print(f"{'concurrency':>12} {'sync req/s':>11} {'async req/s':>12}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            sync_time = await hammer(client, "/sync", args.requests, concurrency)
+            async_time = await hammer(client, "/async", args.requests, concurrency)
+            print(f"{concurrency:>12} {args.requests / sync_time:>11.1f} {args.requests / async_time:>12.1f}")
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
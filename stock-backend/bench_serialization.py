@@ -0,0 +1,98 @@
+"""
+Benchmark: response serialization for large portfolio lists.
+
+Seeds a throwaway SQLite database with --portfolios portfolios of 10 items each,
+then times building the /portfolios/ response both ways:
+  orm:  ORM objects with eager-loaded relationships -> schemas.Portfolio -> jsonable_encoder -> json
+  fast: serializers.portfolios_payload row tuples -> orjson
+
+Usage: python bench_serialization.py [--portfolios 1000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import models, schemas
+import crud_async
+import serializers
+from database import Base
+
+
+def seed(path, count):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.User(id=1, email="bench@example.com", username="bench"))
+    db.add(models.Competition(id=1, name="Bench", slug="bench", entry_deadline=datetime(2026, 1, 1)))
+    db.bulk_insert_mappings(models.Portfolio, [{
+        "id": i, "name": f"Portfolio {i}", "owner_id": 1, "competition_id": 1, "created_at": datetime.utcnow(),
+        "total_value": 1000.0 + i, "total_return_percent": i % 100 / 3,
+    } for i in range(1, count + 1)])
+    db.bulk_insert_mappings(models.PortfolioItem, [{
+        "portfolio_id": i, "symbol": f"SYM{j}", "asset_type": "STOCK", "quantity": 1.0,
+        "initial_price": 100.0 + j, "current_price": 101.5 + j,
+    } for i in range(1, count + 1) for j in range(10)])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+async def orm_path(db, count):
+    result = await db.execute(select(models.Portfolio).options(*crud_async.PORTFOLIO_LOAD).limit(count))
+    portfolios = result.scalars().all()
+    return json.dumps(jsonable_encoder([schemas.Portfolio.from_orm(p) for p in portfolios])).encode()
+
+
+async def fast_path(db, count):
+    payload = await serializers.portfolios_list(db, limit=count)
+    return orjson.dumps(payload)
+
+
+async def timed(fn, Session, count, repeat):
+    best = None
+    for _ in range(repeat):
+        async with Session() as db:
+            start = time.perf_counter()
+            body = await fn(db, count)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--portfolios", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        seed(path, args.portfolios)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        Session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        orm_time, orm_bytes = await timed(orm_path, Session, args.portfolios, args.repeat)
+        fast_time, fast_bytes = await timed(fast_path, Session, args.portfolios, args.repeat)
+        await engine.dispose()
+
+        print(f"{args.portfolios} portfolios x 10 items, best of {args.repeat}")
+        print(f"  orm + pydantic + json: {orm_time * 1000:8.1f} ms  ({orm_bytes} bytes)")
+        print(f"  row tuples + orjson:   {fast_time * 1000:8.1f} ms  ({fast_bytes} bytes)")
+        print(f"  speedup: {orm_time / fast_time:.1f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
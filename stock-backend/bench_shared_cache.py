@@ -0,0 +1,81 @@
+"""
+Benchmark: upstream (yfinance) calls vs. number of workers.
+
+Spawns N processes that each serve the same batch of quote requests, once with
+per-process caching only and once with the shared host cache. yfinance is
+replaced by a fake with a fixed latency so the numbers don't depend on the network.
+
+Usage: python bench_shared_cache.py [--symbols 20] [--rounds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import quotes
+import shared_cache
+
+FAKE_LATENCY_SECONDS = 0.05
+
+
+def worker(cache_path, symbols, rounds, counter, start):
+    # Each worker is a fresh process, like a uvicorn worker
+    shared_cache.cache = shared_cache.SharedCache(cache_path) if cache_path else None
+
+    def fake_fetch(symbol):
+        with counter.get_lock():
+            counter.value += 1
+        time.sleep(FAKE_LATENCY_SECONDS)
+        return {"symbol": symbol, "price": 100.0, "previous_close": 99.0, "change_percent": 1.0}
+
+    quotes.fetch_quote = fake_fetch
+    start.wait()
+    for _ in range(rounds):
+        quotes.get_quotes(symbols)
+
+
+def run(workers, symbols, rounds, shared):
+    cache_path = None
+    if shared:
+        fd, cache_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    counter = multiprocessing.Value("i", 0)
+    start = multiprocessing.Event()
+    procs = [
+        multiprocessing.Process(target=worker, args=(cache_path, symbols, rounds, counter, start))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    t0 = time.time()
+    start.set()
+    for p in procs:
+        p.join()
+    elapsed = time.time() - t0
+
+    if cache_path:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(cache_path + suffix):
+                os.remove(cache_path + suffix)
+    return counter.value, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    print(f"{args.symbols} symbols, {args.rounds} rounds per worker")
+    print(f"{'workers':>8} {'per-process calls':>18} {'shared calls':>13} {'per-process s':>14} {'shared s':>9}")
+    for workers in (1, 2, 4, 8):
+        local_calls, local_time = run(workers, symbols, args.rounds, shared=False)
+        shared_calls, shared_time = run(workers, symbols, args.rounds, shared=True)
+        print(f"{workers:>8} {local_calls:>18} {shared_calls:>13} {local_time:>14.2f} {shared_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
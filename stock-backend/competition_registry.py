@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.orm import Session
+import models, schemas
+
+# Competitions are few and rarely change. Keep them in memory, reloading at
+# most this often so rows created by other workers show up.
+REGISTRY_MAX_AGE_SECONDS = 60
+
+_competitions = None  # competition_id -> schemas.Competition
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def load(db: Session):
+    global _competitions, _loaded_at
+    rows = db.query(models.Competition).order_by(models.Competition.id).all()
+    with _lock:
+        _competitions = {c.id: schemas.Competition.from_orm(c) for c in rows}
+        _loaded_at = time.time()
+
+
+def invalidate():
+    global _competitions
+    with _lock:
+        _competitions = None
+
+
+def _current(db: Session):
+    with _lock:
+        competitions = _competitions
+        fresh = competitions is not None and time.time() - _loaded_at < REGISTRY_MAX_AGE_SECONDS
+    if not fresh:
+        load(db)
+        with _lock:
+            competitions = _competitions
+    return competitions
+
+
+def get_all(db: Session):
+    return list(_current(db).values())
+
+
+def get(db: Session, competition_id: int):
+    competition = _current(db).get(competition_id)
+    if competition is None and _loaded_at < time.time() - 1:
+        # May have been created by another worker since the last load
+        load(db)
+        competition = _current(db).get(competition_id)
+    return competition
+
+
+def is_entry_closed(db: Session, competition_id: int):
+    """True once the competition's entry_deadline has passed (picks locked and revealed)."""
+    if not competition_id:
+        return False
+    competition = get(db, competition_id)
+    return bool(competition and competition.entry_deadline and datetime.utcnow() > competition.entry_deadline)
@@ -1,5 +1,11 @@
-from sqlalchemy.orm import Session
+import json
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
 import models, schemas
+import ranking
+import quotes
+import shared_cache
+import competition_registry
 from datetime import datetime
 from utils import get_password_hash
 
@@ -41,66 +47,83 @@ def create_competition(db: Session, competition: schemas.Competition):
     db.add(db_comp)
     db.commit()
     db.refresh(db_comp)
+    competition_registry.invalidate()
     return db_comp
 
 def get_competitions(db: Session):
-    return db.query(models.Competition).all()
+    return competition_registry.get_all(db)
 
-def create_portfolio(db: Session, portfolio: schemas.PortfolioCreate, user_id: int):
-    # Check entry deadline
-    if portfolio.competition_id:
-        comp = db.query(models.Competition).filter(models.Competition.id == portfolio.competition_id).first()
-        if comp and comp.entry_deadline:
-            if datetime.utcnow() > comp.entry_deadline:
-                 raise ValueError("Competition entry deadline has passed.")
+MAX_PORTFOLIO_ITEMS = 10
 
-    db_portfolio = models.Portfolio(name=portfolio.name, owner_id=user_id, competition_id=portfolio.competition_id)
-    db.add(db_portfolio)
-    db.commit()
-    db.refresh(db_portfolio)
-    
-    initial_total_value = 0.0
+def normalize_symbol(symbol: str):
+    # Auto-correct common typos
+    symbol = symbol.strip().upper()
+    if symbol == "APPL":
+        symbol = "AAPL"
+    return symbol
 
+def validate_new_portfolio(portfolio: schemas.PortfolioCreate):
+    """
+    Check the same rules add_portfolio_item enforces, before any pricing or writes.
+    Returns [(symbol, item)] with normalized symbols.
+    """
+    if len(portfolio.items) > MAX_PORTFOLIO_ITEMS:
+        raise ValueError(f"Portfolio limit reached (max {MAX_PORTFOLIO_ITEMS} items).")
+
+    validated = []
+    seen = set()
     for item in portfolio.items:
-        # Auto-correct common typos
-        symbol = item.symbol.upper()
-        if symbol == "APPL":
-            symbol = "AAPL"
+        symbol = normalize_symbol(item.symbol)
+        if symbol in seen:
+            raise ValueError(f"Asset {symbol} already exists in portfolio.")
+        seen.add(symbol)
+        validated.append((symbol, item))
+    return validated
 
-        # Fetch price with robust fallback
-        import yfinance as yf
+def build_portfolio(portfolio: schemas.PortfolioCreate, user_id: int, validated, prices):
+    """Build the portfolio and its items in memory from prefetched quotes."""
+    db_portfolio = models.Portfolio(name=portfolio.name, owner_id=user_id, competition_id=portfolio.competition_id)
+    initial_total_value = 0.0
+    for symbol, item in validated:
         current_price = 100.0 # Default fallback
-        try:
-             ticker = yf.Ticker(symbol)
-             # Try fast_info first
-             price = ticker.fast_info.last_price
-             if price is not None:
-                 current_price = price
-             else:
-                 # Try 1d history as fallback (slower but more detailed)
-                 hist = ticker.history(period="1d")
-                 if not hist.empty:
-                     current_price = hist['Close'].iloc[-1]
-        except Exception as e:
-             print(f"Failed to fetch price for {item.symbol}: {e}")
-             # Keep default 100.0
-
-        db_item = models.PortfolioItem(
-            portfolio_id=db_portfolio.id,
+        quote = prices.get(symbol)
+        if quote is not None:
+            current_price = quote["price"]
+        else:
+            print(f"Failed to fetch price for {item.symbol}")
+            # Keep default 100.0
+
+        db_portfolio.items.append(models.PortfolioItem(
             symbol=symbol,
             asset_type=item.asset_type,
             quantity=item.quantity,
             initial_price=current_price,
             current_price=current_price
-        )
-        db.add(db_item)
-        initial_total_value += current_price * item.quantity 
-    
-    db_portfolio.total_value = initial_total_value 
+        ))
+        initial_total_value += current_price * item.quantity
+
+    db_portfolio.total_value = initial_total_value
     # initial return is 0
-    
+    db_portfolio.total_return_percent = 0.0
+    return db_portfolio
+
+def create_portfolio(db: Session, portfolio: schemas.PortfolioCreate, user_id: int):
+    # 1. Validate everything up front
+    if competition_registry.is_entry_closed(db, portfolio.competition_id):
+        raise ValueError("Competition entry deadline has passed.")
+    validated = validate_new_portfolio(portfolio)
+
+    # 2. Price all items concurrently, holding no connection or transaction
+    db.rollback() # nothing written yet; just release anything the checks opened
+    prices = quotes.get_quotes([symbol for symbol, _ in validated])
+
+    # 3. Insert the portfolio and all items in one short transaction
+    db_portfolio = build_portfolio(portfolio, user_id, validated, prices)
+    db.add(db_portfolio)
     db.commit()
     db.refresh(db_portfolio)
+    ranking.record_return(db_portfolio.competition_id, db_portfolio.id, db_portfolio.total_return_percent)
+    invalidate_leaderboard(db_portfolio.competition_id)
     return db_portfolio
 
 def get_portfolios(db: Session, skip: int = 0, limit: int = 100):
@@ -110,32 +133,22 @@ def get_portfolio(db: Session, portfolio_id: int):
     return db.query(models.Portfolio).filter(models.Portfolio.id == portfolio_id).first()
 
 def update_portfolio_values(db: Session, portfolio_id: int):
-    import yfinance as yf
     portfolio = db.query(models.Portfolio).filter(models.Portfolio.id == portfolio_id).first()
     if not portfolio:
         return None
     
     current_total_value = 0.0
     initial_total_value = 0.0
+
+    # Fetch all prices in one batch (cached, uncached symbols concurrently)
+    prices = quotes.get_quotes([item.symbol for item in portfolio.items])
     
     for item in portfolio.items:
-        # Fetch price with robust fallback
-        try:
-            ticker = yf.Ticker(item.symbol)
-            # Try fast_info first
-            current_price = ticker.fast_info.last_price
-            
-            if current_price is None:
-                 # Try 1d history as fallback
-                 hist = ticker.history(period="1d")
-                 if not hist.empty:
-                     current_price = hist['Close'].iloc[-1]
-            
-            if current_price is None:
-                 raise ValueError("Price is still None after fallbacks")
-
-        except Exception as e:
-            print(f"Error updating {item.symbol}: {e}")
+        quote = prices.get(item.symbol)
+        if quote is not None:
+            current_price = quote["price"]
+        else:
+            print(f"Error updating {item.symbol}: no price available")
             # Fallback to initial price
             current_price = item.initial_price if item.initial_price is not None else 100.0
         
@@ -152,6 +165,7 @@ def update_portfolio_values(db: Session, portfolio_id: int):
         item.current_price = current_price
     
     portfolio.total_value = current_total_value
+    portfolio.refreshed_at = datetime.utcnow()
     
     if initial_total_value > 0:
         portfolio.total_return_percent = ((current_total_value - initial_total_value) / initial_total_value) * 100
@@ -160,13 +174,67 @@ def update_portfolio_values(db: Session, portfolio_id: int):
 
     db.commit()
     db.refresh(portfolio)
+    ranking.record_return(portfolio.competition_id, portfolio.id, portfolio.total_return_percent)
+    invalidate_leaderboard(portfolio.competition_id)
     return portfolio
 
+def invalidate_leaderboard(competition_id: int):
+    if competition_id is not None and shared_cache.cache is not None:
+        shared_cache.cache.delete(shared_cache.leaderboard_key(competition_id))
+
 def get_competition_leaderboard(db: Session, competition_id: int, limit: int = 100):
     return db.query(models.Portfolio).filter(models.Portfolio.competition_id == competition_id)\
              .order_by(models.Portfolio.total_return_percent.desc())\
              .limit(limit).all()
 
+def get_archived_at(db: Session, competition_id: int):
+    # Read straight from the table: archiving runs in another process, so the
+    # registry can lag behind it by up to REGISTRY_MAX_AGE_SECONDS
+    return db.query(models.Competition.archived_at).filter(models.Competition.id == competition_id).scalar()
+
+def get_portfolio_rank(db: Session, competition_id: int, portfolio_id: int, k: int = 5):
+    if get_archived_at(db, competition_id):
+        return get_archived_rank(db, competition_id, portfolio_id, k)
+
+    portfolio = get_portfolio(db, portfolio_id)
+    if not portfolio or portfolio.competition_id != competition_id:
+        return None
+
+    rank, total, window = ranking.lookup(db, competition_id, portfolio_id, portfolio.total_return_percent, k)
+
+    # Only the neighbor rows are loaded, never the whole competition
+    neighbor_ids = [pid for _, pid, _ in window]
+    rows = db.query(models.Portfolio.id, models.Portfolio.name, models.Portfolio.owner_id,
+                    models.User.username, models.Portfolio.total_value)\
+             .outerjoin(models.User, models.User.id == models.Portfolio.owner_id)\
+             .filter(models.Portfolio.id.in_(neighbor_ids)).all()
+    by_id = {row.id: row for row in rows}
+
+    neighbors = []
+    for entry_rank, pid, total_return_percent in window:
+        row = by_id.get(pid)
+        if row is None:
+            continue
+        neighbors.append({
+            "rank": entry_rank,
+            "portfolio_id": pid,
+            "name": row.name,
+            "owner_id": row.owner_id,
+            "username": row.username,
+            "total_value": row.total_value or 0.0,
+            "total_return_percent": total_return_percent,
+        })
+
+    return {
+        "competition_id": competition_id,
+        "portfolio_id": portfolio_id,
+        "rank": rank,
+        "total": total,
+        # Share of the field ranked at or below this portfolio (top entry = 100)
+        "percentile": (total - rank + 1) / total * 100,
+        "neighbors": neighbors,
+    }
+
 def add_portfolio_item(db: Session, portfolio_id: int, item: schemas.PortfolioItemCreate, user_id: int):
     portfolio = db.query(models.Portfolio).filter(models.Portfolio.id == portfolio_id).first()
     if not portfolio:
@@ -176,20 +244,14 @@ def add_portfolio_item(db: Session, portfolio_id: int, item: schemas.PortfolioIt
         raise ValueError("Not authorized to edit this portfolio")
 
     # Limit check
-    if len(portfolio.items) >= 10:
-        raise ValueError("Portfolio limit reached (max 10 items).")
+    if len(portfolio.items) >= MAX_PORTFOLIO_ITEMS:
+        raise ValueError(f"Portfolio limit reached (max {MAX_PORTFOLIO_ITEMS} items).")
 
     # Deadline check
-    if portfolio.competition_id:
-        comp = db.query(models.Competition).filter(models.Competition.id == portfolio.competition_id).first()
-        if comp and comp.entry_deadline:
-            if datetime.utcnow() > comp.entry_deadline:
-                 raise ValueError("Competition entry deadline has passed.")
+    if competition_registry.is_entry_closed(db, portfolio.competition_id):
+        raise ValueError("Competition entry deadline has passed.")
 
-    # Auto-correct common typos
-    symbol = item.symbol.upper()
-    if symbol == "APPL":
-        symbol = "AAPL"
+    symbol = normalize_symbol(item.symbol)
         
     # Check if item already exists
     existing_item = db.query(models.PortfolioItem).filter(
@@ -200,23 +262,14 @@ def add_portfolio_item(db: Session, portfolio_id: int, item: schemas.PortfolioIt
     if existing_item:
         raise ValueError(f"Asset {symbol} already exists in portfolio.")
 
-    # Fetch price with robust fallback
-    import yfinance as yf
+    # Fetch price (shared cache, then yfinance)
     current_price = 100.0 # Default fallback
-    try:
-         ticker = yf.Ticker(symbol)
-         # Try fast_info first
-         price = ticker.fast_info.last_price
-         if price is not None:
-             current_price = price
-         else:
-             # Try 1d history as fallback
-             hist = ticker.history(period="1d")
-             if not hist.empty:
-                 current_price = hist['Close'].iloc[-1]
-    except Exception as e:
-         print(f"Failed to fetch price for {symbol}: {e}")
-         # Keep default 100.0
+    quote = quotes.get_quote(symbol)
+    if quote is not None:
+        current_price = quote["price"]
+    else:
+        print(f"Failed to fetch price for {symbol}")
+        # Keep default 100.0
 
     db_item = models.PortfolioItem(
         portfolio_id=portfolio.id,
@@ -230,10 +283,128 @@ def add_portfolio_item(db: Session, portfolio_id: int, item: schemas.PortfolioIt
     
     # Update total value immediately so it looks correct vs item sums
     portfolio.total_value += current_price * item.quantity
+    # Holdings changed, so the next refresh must revalue instead of returning this
+    portfolio.refreshed_at = None
     
     # Note: total_return_percent will be wrong until refresh because initial_total_value (basis) 
     # isn't explicitly stored/updated here, but next refresh will calculate it from all items.
     
     db.commit()
     db.refresh(portfolio)
+    invalidate_leaderboard(portfolio.competition_id)
     return portfolio
+
+def archived_portfolio(standing: models.ArchivedStanding, competition=None):
+    """Rebuild a schemas.Portfolio-shaped dict from a frozen standing."""
+    return {
+        "id": standing.portfolio_id,
+        "name": standing.name,
+        "owner_id": standing.owner_id,
+        "competition_id": standing.competition_id,
+        "created_at": standing.created_at,
+        "total_value": standing.total_value,
+        "total_return_percent": standing.total_return_percent,
+        "refreshed_at": None,
+        "items": [dict(item, portfolio_id=standing.portfolio_id) for item in json.loads(standing.holdings)],
+        "competition": competition,
+        "owner": {"id": standing.owner_id, "username": standing.owner_username},
+    }
+
+def get_archived_rank(db: Session, competition_id: int, portfolio_id: int, k: int = 5):
+    standing = db.query(models.ArchivedStanding).filter(
+        models.ArchivedStanding.competition_id == competition_id,
+        models.ArchivedStanding.portfolio_id == portfolio_id
+    ).first()
+    if not standing:
+        return None
+
+    total = db.query(func.count(models.ArchivedStanding.id))\
+              .filter(models.ArchivedStanding.competition_id == competition_id).scalar()
+    window = db.query(models.ArchivedStanding).filter(
+        models.ArchivedStanding.competition_id == competition_id,
+        models.ArchivedStanding.position.between(standing.position - k, standing.position + k)
+    ).order_by(models.ArchivedStanding.position).all()
+
+    return {
+        "competition_id": competition_id,
+        "portfolio_id": portfolio_id,
+        "rank": standing.rank,
+        "total": total,
+        "percentile": (total - standing.rank + 1) / total * 100,
+        "neighbors": [{
+            "rank": row.rank,
+            "portfolio_id": row.portfolio_id,
+            "name": row.name,
+            "owner_id": row.owner_id,
+            "username": row.owner_username,
+            "total_value": row.total_value,
+            "total_return_percent": row.total_return_percent,
+        } for row in window],
+    }
+
+def archive_competition(db: Session, competition_id: int):
+    """
+    Freeze a closed competition's final standings and holdings into
+    archived_standings, then prune its live portfolios and items.
+    Runs in a single transaction. Returns the number of standings archived.
+    """
+    comp = db.query(models.Competition).filter(models.Competition.id == competition_id).first()
+    if not comp:
+        raise ValueError("Competition not found")
+    if comp.archived_at:
+        raise ValueError("Competition is already archived.")
+    if not comp.entry_deadline or datetime.utcnow() <= comp.entry_deadline:
+        raise ValueError("Competition is still open for entries.")
+
+    portfolios = db.query(models.Portfolio)\
+                   .options(selectinload(models.Portfolio.items), selectinload(models.Portfolio.owner))\
+                   .filter(models.Portfolio.competition_id == competition_id)\
+                   .order_by(models.Portfolio.total_return_percent.desc(), models.Portfolio.id).all()
+
+    standings = []
+    rank = 0
+    previous_return = None
+    for position, p in enumerate(portfolios):
+        total_return_percent = p.total_return_percent or 0.0
+        # Ties share a rank, same as the live ranking index
+        if total_return_percent != previous_return:
+            rank = position + 1
+            previous_return = total_return_percent
+        holdings = [{
+            "id": item.id,
+            "symbol": item.symbol,
+            "asset_type": item.asset_type,
+            "quantity": item.quantity,
+            "initial_price": item.initial_price,
+            "current_price": item.current_price,
+        } for item in p.items]
+        standings.append({
+            "competition_id": competition_id,
+            "position": position,
+            "rank": rank,
+            "portfolio_id": p.id,
+            "name": p.name,
+            "owner_id": p.owner_id,
+            "owner_username": p.owner.username if p.owner else None,
+            "created_at": p.created_at,
+            "total_value": p.total_value or 0.0,
+            "total_return_percent": total_return_percent,
+            "holdings": json.dumps(holdings, separators=(",", ":")),
+        })
+
+    db.bulk_insert_mappings(models.ArchivedStanding, standings)
+
+    # Prune the live rows so the hot tables only hold the current season
+    live_ids = select(models.Portfolio.id).where(models.Portfolio.competition_id == competition_id)
+    db.query(models.PortfolioItem).filter(models.PortfolioItem.portfolio_id.in_(live_ids))\
+      .delete(synchronize_session=False)
+    db.query(models.Portfolio).filter(models.Portfolio.competition_id == competition_id)\
+      .delete(synchronize_session=False)
+
+    comp.archived_at = datetime.utcnow()
+    db.commit()
+
+    competition_registry.invalidate()
+    ranking.invalidate(competition_id)
+    invalidate_leaderboard(competition_id)
+    return len(standings)
@@ -0,0 +1,269 @@
+"""
+Async versions of the crud functions used by the routers.
+Same behaviour as crud.py, but on an AsyncSession. Relationships needed by the
+response schemas are eager-loaded, since lazy loads can't run under asyncio.
+Network and CPU-bound work (quotes, password hashing) runs in worker threads.
+"""
+import asyncio
+import os
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+import models, schemas
+import crud
+import database
+import quotes
+import ranking
+import competition_registry
+from utils import get_password_hash
+
+# A portfolio revalued more recently than this is returned as stored
+REFRESH_MIN_INTERVAL_SECONDS = int(os.getenv("REFRESH_MIN_INTERVAL_SECONDS", "60"))
+
+_refreshes = {}  # portfolio_id -> in-flight revaluation task
+
+# Everything schemas.Portfolio serializes
+PORTFOLIO_LOAD = (
+    selectinload(models.Portfolio.items),
+    selectinload(models.Portfolio.competition),
+    selectinload(models.Portfolio.owner),
+)
+
+async def get_user(db: AsyncSession, user_id: int):
+    # Portfolios are not loaded here; responses are built by serializers.user_payload
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    return result.scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # pbkdf2 is deliberately slow; keep it off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
+    token = secrets.token_urlsafe(32)
+    db_user = models.User(
+        email=user.email,
+        username=user.username,
+        hashed_password=hashed_password,
+        verification_token=token,
+        is_verified=False
+    )
+    db.add(db_user)
+    await db.commit()
+    # A new user has no portfolios yet, but the collection must be loaded for the response
+    await db.refresh(db_user, ["portfolios"])
+    return db_user
+
+async def get_competitions(db: AsyncSession):
+    return await db.run_sync(competition_registry.get_all)
+
+async def get_competition(db: AsyncSession, competition_id: int):
+    return await db.run_sync(competition_registry.get, competition_id)
+
+async def is_entry_closed(db: AsyncSession, competition_id: int):
+    return await db.run_sync(competition_registry.is_entry_closed, competition_id)
+
+async def get_portfolio(db: AsyncSession, portfolio_id: int):
+    result = await db.execute(
+        select(models.Portfolio).options(*PORTFOLIO_LOAD)
+        .where(models.Portfolio.id == portfolio_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_portfolios(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Portfolio).options(*PORTFOLIO_LOAD).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def create_portfolio(db: AsyncSession, portfolio: schemas.PortfolioCreate, user_id: int):
+    # 1. Validate everything up front
+    if await is_entry_closed(db, portfolio.competition_id):
+        raise ValueError("Competition entry deadline has passed.")
+    validated = crud.validate_new_portfolio(portfolio)
+
+    # 2. Price all items concurrently, holding no connection or transaction
+    await db.rollback() # nothing written yet; just release anything the checks opened
+    prices = await asyncio.to_thread(quotes.get_quotes, [symbol for symbol, _ in validated])
+
+    # 3. Insert the portfolio and all items in one short transaction
+    db_portfolio = crud.build_portfolio(portfolio, user_id, validated, prices)
+    db.add(db_portfolio)
+    await db.commit()
+    ranking.record_return(db_portfolio.competition_id, db_portfolio.id, db_portfolio.total_return_percent)
+    # Shared cache writes are blocking SQLite calls (busy timeout of seconds)
+    await asyncio.to_thread(crud.invalidate_leaderboard, db_portfolio.competition_id)
+    return await get_portfolio(db, db_portfolio.id)
+
+async def update_portfolio_values(db: AsyncSession, portfolio_id: int):
+    portfolio = await get_portfolio(db, portfolio_id)
+    if not portfolio:
+        return None
+
+    current_total_value = 0.0
+    initial_total_value = 0.0
+
+    # Fetch all prices in one batch (cached, uncached symbols concurrently)
+    prices = await asyncio.to_thread(quotes.get_quotes, [item.symbol for item in portfolio.items])
+
+    for item in portfolio.items:
+        quote = prices.get(item.symbol)
+        if quote is not None:
+            current_price = quote["price"]
+        else:
+            print(f"Error updating {item.symbol}: no price available")
+            # Fallback to initial price
+            current_price = item.initial_price if item.initial_price is not None else 100.0
+
+        # Super safe fallback
+        if current_price is None:
+            current_price = 100.0
+
+        current_total_value += current_price * item.quantity
+        initial_total_value += item.initial_price * item.quantity
+
+        # Update current price in DB
+        item.current_price = current_price
+
+    portfolio.total_value = current_total_value
+    portfolio.refreshed_at = datetime.utcnow()
+
+    if initial_total_value > 0:
+        portfolio.total_return_percent = ((current_total_value - initial_total_value) / initial_total_value) * 100
+    else:
+        portfolio.total_return_percent = 0.0
+
+    await db.commit()
+    ranking.record_return(portfolio.competition_id, portfolio.id, portfolio.total_return_percent)
+    await asyncio.to_thread(crud.invalidate_leaderboard, portfolio.competition_id)
+    return portfolio
+
+async def _run_refresh(portfolio_id: int):
+    # Own session, so the revaluation doesn't depend on whichever request started it
+    async with database.AsyncSessionLocal() as db:
+        await update_portfolio_values(db, portfolio_id)
+
+async def refresh_portfolio(db: AsyncSession, portfolio_id: int):
+    """
+    Revalue a portfolio unless it was refreshed within REFRESH_MIN_INTERVAL_SECONDS.
+    Concurrent calls for the same portfolio share one in-flight revaluation.
+    """
+    portfolio = await get_portfolio(db, portfolio_id)
+    if not portfolio:
+        return None
+
+    interval = timedelta(seconds=REFRESH_MIN_INTERVAL_SECONDS)
+    if portfolio.refreshed_at and datetime.utcnow() - portfolio.refreshed_at < interval:
+        return portfolio
+
+    task = _refreshes.get(portfolio_id)
+    if task is None:
+        task = asyncio.ensure_future(_run_refresh(portfolio_id))
+        _refreshes[portfolio_id] = task
+        task.add_done_callback(lambda _: _refreshes.pop(portfolio_id, None))
+    # shield: a caller disconnecting mustn't cancel the refresh for everyone else
+    await asyncio.shield(task)
+    return await get_portfolio(db, portfolio_id)
+
+async def get_competition_leaderboard(db: AsyncSession, competition_id: int, limit: int = 100):
+    result = await db.execute(
+        select(models.Portfolio).options(*PORTFOLIO_LOAD)
+        .where(models.Portfolio.competition_id == competition_id)
+        .order_by(models.Portfolio.total_return_percent.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_archived_at(db: AsyncSession, competition_id: int):
+    # Not from the registry, which can lag an archive run by up to a minute
+    result = await db.execute(select(models.Competition.archived_at).where(models.Competition.id == competition_id))
+    return result.scalar()
+
+async def _load_competition(db: AsyncSession, competition_id: int):
+    # Fresh row (archived_at included) for frozen standings, bypassing the registry
+    result = await db.execute(select(models.Competition).where(models.Competition.id == competition_id))
+    competition = result.scalars().first()
+    return schemas.Competition.from_orm(competition) if competition else None
+
+async def get_archived_leaderboard(db: AsyncSession, competition_id: int, limit: int = 100):
+    competition = await _load_competition(db, competition_id)
+    result = await db.execute(
+        select(models.ArchivedStanding)
+        .where(models.ArchivedStanding.competition_id == competition_id)
+        .order_by(models.ArchivedStanding.position)
+        .limit(limit)
+    )
+    return [crud.archived_portfolio(standing, competition) for standing in result.scalars().all()]
+
+async def get_archived_portfolio(db: AsyncSession, portfolio_id: int):
+    result = await db.execute(
+        select(models.ArchivedStanding).where(models.ArchivedStanding.portfolio_id == portfolio_id)
+    )
+    standing = result.scalars().first()
+    if not standing:
+        return None
+    competition = await _load_competition(db, standing.competition_id)
+    return crud.archived_portfolio(standing, competition)
+
+def _portfolio_rank_sync(competition_id: int, portfolio_id: int, k: int):
+    db = database.SessionLocal()
+    try:
+        return crud.get_portfolio_rank(db, competition_id, portfolio_id, k)
+    finally:
+        db.close()
+
+async def get_portfolio_rank(db: AsyncSession, competition_id: int, portfolio_id: int, k: int = 5):
+    # The rank index is shared between threads behind a threading lock, so the
+    # lookup runs in a worker thread on its own sync session, never on the loop
+    return await asyncio.to_thread(_portfolio_rank_sync, competition_id, portfolio_id, k)
+
+async def add_portfolio_item(db: AsyncSession, portfolio_id: int, item: schemas.PortfolioItemCreate, user_id: int):
+    portfolio = await get_portfolio(db, portfolio_id)
+    if not portfolio:
+        raise ValueError("Portfolio not found")
+
+    if portfolio.owner_id != user_id:
+        raise ValueError("Not authorized to edit this portfolio")
+
+    # Limit check
+    if len(portfolio.items) >= crud.MAX_PORTFOLIO_ITEMS:
+        raise ValueError(f"Portfolio limit reached (max {crud.MAX_PORTFOLIO_ITEMS} items).")
+
+    # Deadline check
+    if await is_entry_closed(db, portfolio.competition_id):
+        raise ValueError("Competition entry deadline has passed.")
+
+    symbol = crud.normalize_symbol(item.symbol)
+
+    # Check if item already exists
+    if any(existing.symbol == symbol for existing in portfolio.items):
+        raise ValueError(f"Asset {symbol} already exists in portfolio.")
+
+    # Fetch price (shared cache, then yfinance)
+    current_price = 100.0 # Default fallback
+    quote = await asyncio.to_thread(quotes.get_quote, symbol)
+    if quote is not None:
+        current_price = quote["price"]
+    else:
+        print(f"Failed to fetch price for {symbol}")
+        # Keep default 100.0
+
+    db.add(models.PortfolioItem(
+        portfolio_id=portfolio.id,
+        symbol=symbol,
+        asset_type=item.asset_type,
+        quantity=item.quantity,
+        initial_price=current_price,
+        current_price=current_price
+    ))
+
+    # Update total value immediately so it looks correct vs item sums
+    portfolio.total_value += current_price * item.quantity
+    # Holdings changed, so the next refresh must revalue instead of returning this
+    portfolio.refreshed_at = None
+
+    await db.commit()
+    await asyncio.to_thread(crud.invalidate_leaderboard, portfolio.competition_id)
+    return await get_portfolio(db, portfolio.id)
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
 from routers import users, portfolios, stocks, competitions
+from responses import FastJSONResponse
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -20,9 +21,13 @@ if not db.query(models.Competition).first():
     db.add(models.Competition(name="Q1 2026 Competition", slug="q1-2026", entry_deadline=deadline))
     db.add(models.Competition(name="2026 Full Year Competition", slug="2026-full", entry_deadline=deadline))
     db.commit()
+
+# Competitions are served from memory; warm the registry before taking traffic
+import competition_registry
+competition_registry.load(db)
 db.close()
 
-app = FastAPI(title="Stock Picking Competition")
+app = FastAPI(title="Stock Picking Competition", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
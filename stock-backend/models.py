@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Date, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -23,6 +23,7 @@ class Competition(Base):
     name = Column(String, unique=True, index=True)
     slug = Column(String, unique=True, index=True) # e.g. 'q1-2026', '2026-full'
     entry_deadline = Column(DateTime, nullable=True) # Lock-in date
+    archived_at = Column(DateTime, nullable=True) # Set once standings are frozen into archived_standings
 
     portfolios = relationship("Portfolio", back_populates="competition")
 
@@ -38,6 +39,7 @@ class Portfolio(Base):
     # Total value snapshot (can be updated periodically)
     total_value = Column(Float, default=0.0)
     total_return_percent = Column(Float, default=0.0)
+    refreshed_at = Column(DateTime, nullable=True) # Last revaluation against live prices
 
     owner = relationship("User", back_populates="portfolios")
     competition = relationship("Competition", back_populates="portfolios")
@@ -59,3 +61,30 @@ class PortfolioItem(Base):
     # Let's store initial price to calculate return.
 
     portfolio = relationship("Portfolio", back_populates="items")
+
+class PriceBar(Base):
+    __tablename__ = "price_bars"
+    __table_args__ = (UniqueConstraint("symbol", "date", name="uq_price_bars_symbol_date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, index=True)
+    date = Column(Date, index=True) # Trading day
+    close = Column(Float)
+
+class ArchivedStanding(Base):
+    """Frozen final standing and holdings of a portfolio in an archived competition."""
+    __tablename__ = "archived_standings"
+    __table_args__ = (Index("ix_archived_standings_competition_position", "competition_id", "position"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    competition_id = Column(Integer, ForeignKey("competitions.id"))
+    position = Column(Integer) # 0-based order on the final leaderboard
+    rank = Column(Integer) # Ties share a rank
+    portfolio_id = Column(Integer, index=True) # Original portfolios.id (row is pruned)
+    name = Column(String)
+    owner_id = Column(Integer, index=True)
+    owner_username = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    total_value = Column(Float)
+    total_return_percent = Column(Float)
+    holdings = Column(Text) # JSON list of the portfolio's items
@@ -0,0 +1,140 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import yfinance as yf
+import shared_cache
+
+# How long a fetched quote is reused before going back to yfinance
+QUOTE_TTL_SECONDS = 60
+# The per-process copy is kept shorter so it never outlives the shared one by much
+LOCAL_QUOTE_TTL_SECONDS = 15
+# Upper bound on concurrent yfinance calls for a single batch
+MAX_FETCH_WORKERS = 8
+# While another worker holds the fetch lease for a symbol, wait this long for
+# its result to land in the shared cache before fetching ourselves
+LEASE_SECONDS = 10
+LEASE_WAIT_SECONDS = 3
+LEASE_POLL_SECONDS = 0.05
+
+QUOTE_FIELDS = ("price", "previous_close", "change_percent")
+
+_cache = {}  # symbol -> (expires_at, quote)
+_cache_lock = threading.Lock()
+
+
+def fetch_quote(symbol: str):
+    """Fetch a single quote from yfinance. Returns None if no price is available."""
+    try:
+        ticker = yf.Ticker(symbol)
+        # fast_info is faster for just price
+        price = ticker.fast_info.last_price
+        previous_close = ticker.fast_info.previous_close
+
+        if price is None:
+            # Try 1d history as fallback (slower but more detailed)
+            hist = ticker.history(period="1d")
+            if not hist.empty:
+                price = float(hist['Close'].iloc[-1])
+    except Exception as e:
+        print(f"Error fetching price for {symbol}: {e}")
+        return None
+
+    if price is None:
+        return None
+
+    change_percent = 0.0
+    if previous_close:
+        change_percent = ((price - previous_close) / previous_close) * 100
+
+    return {
+        "symbol": symbol,
+        "price": price,
+        "previous_close": previous_close,
+        "change_percent": change_percent,
+    }
+
+
+def _fetch_concurrently(symbols):
+    if not symbols:
+        return {}
+    workers = min(MAX_FETCH_WORKERS, len(symbols))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(symbols, pool.map(fetch_quote, symbols)))
+
+
+def _fetch_shared(symbols, shared):
+    """
+    Fetch symbols missing from every cache tier. Each symbol is fetched by only
+    one worker on the host; the others wait for it to appear in the shared cache.
+    """
+    keys = {symbol: shared_cache.quote_key(symbol) for symbol in symbols}
+    won = shared.acquire_leases(list(keys.values()), LEASE_SECONDS)
+    mine = [s for s in symbols if keys[s] in won]
+    waiting = [s for s in symbols if keys[s] not in won]
+
+    result = {}
+    try:
+        result.update(_fetch_concurrently(mine))
+        shared.set_many({keys[s]: q for s, q in result.items() if q is not None}, QUOTE_TTL_SECONDS)
+    finally:
+        shared.release_leases([keys[s] for s in mine])
+
+    deadline = time.time() + LEASE_WAIT_SECONDS
+    while waiting and time.time() < deadline:
+        time.sleep(LEASE_POLL_SECONDS)
+        found = shared.get_many([keys[s] for s in waiting])
+        for s in waiting:
+            if keys[s] in found:
+                result[s] = found[keys[s]]
+        waiting = [s for s in waiting if s not in result]
+
+    # The other worker failed or is too slow; don't leave the caller empty-handed
+    result.update(_fetch_concurrently(waiting))
+    return result
+
+
+def get_quotes(symbols):
+    """
+    Return {symbol: quote or None} for the given symbols.
+    Lookups go in-process cache -> shared host cache -> yfinance, and symbols
+    missing from both caches are fetched concurrently.
+    """
+    now = time.time()
+    result = {}
+    missing = []
+
+    with _cache_lock:
+        for symbol in symbols:
+            if symbol in result or symbol in missing:
+                continue
+            cached = _cache.get(symbol)
+            if cached and cached[0] > now:
+                result[symbol] = cached[1]
+            else:
+                missing.append(symbol)
+
+    if not missing:
+        return result
+
+    shared = shared_cache.cache
+    if shared is not None:
+        found = shared.get_many([shared_cache.quote_key(s) for s in missing])
+        fetched = {s: found[shared_cache.quote_key(s)] for s in missing if shared_cache.quote_key(s) in found}
+        fetched.update(_fetch_shared([s for s in missing if s not in fetched], shared))
+    else:
+        fetched = _fetch_concurrently(missing)
+
+    expires_at = time.time() + LOCAL_QUOTE_TTL_SECONDS
+    with _cache_lock:
+        for symbol in missing:
+            quote = fetched.get(symbol)
+            result[symbol] = quote
+            # Don't cache failures, so the next request retries
+            if quote is not None:
+                _cache[symbol] = (expires_at, quote)
+
+    return result
+
+
+def get_quote(symbol: str):
+    return get_quotes([symbol])[symbol]
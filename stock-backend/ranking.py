@@ -0,0 +1,167 @@
+import threading
+import time
+from sortedcontainers import SortedList
+from sqlalchemy.orm import Session
+import database
+import models
+
+# Rebuild a competition's index from the DB in the background after this long,
+# so writes made by other workers are picked up. Lookups never wait for it.
+INDEX_MAX_AGE_SECONDS = 30
+
+
+class CompetitionRanking:
+    """
+    Order-statistic index for one competition.
+    Keys are (-total_return_percent, portfolio_id) in a SortedList, so updates and
+    rank lookups are O(log n) regardless of how many portfolios are entered.
+    """
+
+    def __init__(self, rows, built_at: float = None):
+        self.returns = {pid: (ret or 0.0) for pid, ret in rows}
+        self.keys = SortedList((-ret, pid) for pid, ret in self.returns.items())
+        self.built_at = built_at if built_at is not None else time.time()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, portfolio_id):
+        return portfolio_id in self.returns
+
+    def update(self, portfolio_id: int, total_return_percent: float):
+        total_return_percent = total_return_percent or 0.0
+        if self.returns.get(portfolio_id) == total_return_percent:
+            return
+        self.remove(portfolio_id)
+        self.returns[portfolio_id] = total_return_percent
+        self.keys.add((-total_return_percent, portfolio_id))
+
+    def remove(self, portfolio_id: int):
+        ret = self.returns.pop(portfolio_id, None)
+        if ret is not None:
+            self.keys.discard((-ret, portfolio_id))
+
+    def rank_for_return(self, total_return_percent: float):
+        # Ties share a rank: 1 + number of portfolios with a strictly higher return
+        return self.keys.bisect_left((-total_return_percent,)) + 1
+
+    def position(self, portfolio_id: int):
+        return self.keys.index((-self.returns[portfolio_id], portfolio_id))
+
+    def window(self, portfolio_id: int, k: int):
+        """Return [(rank, portfolio_id, return)] for the entries within k places of portfolio_id."""
+        i = self.position(portfolio_id)
+        entries = []
+        for neg_ret, pid in self.keys.islice(max(0, i - k), i + k + 1):
+            entries.append((self.rank_for_return(-neg_ret), pid, -neg_ret))
+        return entries
+
+
+_rankings = {}  # competition_id -> CompetitionRanking
+_pending = {}  # competition_id -> {portfolio_id: return} recorded while a build is running
+_building = {}  # competition_id -> number of builds running
+_refreshing = set()  # competition_ids with a background rebuild scheduled
+_invalidated_at = {}  # competition_id (None = all) -> time of the last invalidate()
+_lock = threading.Lock()  # never held across DB I/O
+
+
+def _end_build(competition_id: int):
+    # Caller holds _lock. Returns the returns recorded since the build began.
+    pending = _pending[competition_id]
+    _building[competition_id] -= 1
+    if not _building[competition_id]:
+        del _building[competition_id]
+        del _pending[competition_id]
+    return pending
+
+
+def _build(db: Session, competition_id: int):
+    """Load the competition from the DB and swap the new index in."""
+    with _lock:
+        _building[competition_id] = _building.get(competition_id, 0) + 1
+        _pending.setdefault(competition_id, {})
+    try:
+        started = time.time()
+        rows = db.query(models.Portfolio.id, models.Portfolio.total_return_percent)\
+                 .filter(models.Portfolio.competition_id == competition_id).all()
+        ranking = CompetitionRanking(rows, built_at=started)
+    except Exception:
+        with _lock:
+            _end_build(competition_id)
+        raise
+
+    with _lock:
+        # Returns recorded in this worker while the query ran may be newer than its rows
+        for portfolio_id, total_return_percent in _end_build(competition_id).items():
+            ranking.update(portfolio_id, total_return_percent)
+        # A build that started before an invalidate() may have read the old data
+        invalidated = max(_invalidated_at.get(competition_id, 0.0), _invalidated_at.get(None, 0.0))
+        current = _rankings.get(competition_id)
+        if ranking.built_at > invalidated and (current is None or current.built_at < ranking.built_at):
+            _rankings[competition_id] = ranking
+    return ranking
+
+
+def _refresh(competition_id: int):
+    db = database.SessionLocal()
+    try:
+        _build(db, competition_id)
+    except Exception as e:
+        print(f"Error refreshing ranking for competition {competition_id}: {e}")
+    finally:
+        db.close()
+        with _lock:
+            _refreshing.discard(competition_id)
+
+
+def _schedule_refresh(competition_id: int):
+    with _lock:
+        if competition_id in _refreshing:
+            return
+        _refreshing.add(competition_id)
+    threading.Thread(target=_refresh, args=(competition_id,), daemon=True).start()
+
+
+def lookup(db: Session, competition_id: int, portfolio_id: int, total_return_percent: float, k: int = 5):
+    """
+    Return (rank, total, neighbors) for a portfolio. neighbors is
+    [(rank, portfolio_id, return)] within k places.
+    total_return_percent is the portfolio's current stored return; it is written
+    into the index first, so the portfolio itself is always placed exactly (and
+    one created by another worker is added without a rebuild).
+    Only the first lookup for a competition in this worker loads it; after that a
+    stale index is served while a background thread rebuilds it.
+    """
+    with _lock:
+        ranking = _rankings.get(competition_id)
+    if ranking is None:
+        ranking = _build(db, competition_id)
+    elif time.time() - ranking.built_at > INDEX_MAX_AGE_SECONDS:
+        _schedule_refresh(competition_id)
+
+    with _lock:
+        ranking = _rankings.get(competition_id, ranking)
+        ranking.update(portfolio_id, total_return_percent)
+        rank = ranking.rank_for_return(ranking.returns[portfolio_id])
+        return rank, len(ranking), ranking.window(portfolio_id, k)
+
+
+def record_return(competition_id: int, portfolio_id: int, total_return_percent: float):
+    """Keep an already-built index current after a portfolio is created or revalued."""
+    if competition_id is None:
+        return
+    with _lock:
+        ranking = _rankings.get(competition_id)
+        if ranking is not None:
+            ranking.update(portfolio_id, total_return_percent)
+        if competition_id in _pending:
+            _pending[competition_id][portfolio_id] = total_return_percent
+
+
+def invalidate(competition_id: int = None):
+    with _lock:
+        _invalidated_at[competition_id] = time.time()
+        if competition_id is None:
+            _rankings.clear()
+        else:
+            _rankings.pop(competition_id, None)
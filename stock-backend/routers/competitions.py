@@ -1,14 +1,53 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.encoders import jsonable_encoder
 from typing import List
-import crud, models, schemas, database
+import orjson
+import crud_async, models, schemas, database, shared_cache, serializers
 
 router = APIRouter()
 
+# Leaderboards are also invalidated by crud whenever a portfolio in them changes
+LEADERBOARD_CACHE_TTL_SECONDS = 30
+
 @router.get("/competitions/", response_model=List[schemas.Competition])
-def read_competitions(db: Session = Depends(database.get_db)):
-    return crud.get_competitions(db)
+async def read_competitions(db: AsyncSession = Depends(database.get_async_db)):
+    return await crud_async.get_competitions(db)
 
 @router.get("/competitions/{competition_id}/leaderboard", response_model=List[schemas.Portfolio])
-def get_leaderboard(competition_id: int, db: Session = Depends(database.get_db)):
-    return crud.get_competition_leaderboard(db, competition_id)
+async def get_leaderboard(competition_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    cache = shared_cache.cache
+    key = shared_cache.leaderboard_key(competition_id)
+    if cache is not None:
+        # Stored as the rendered JSON body, so a hit costs no serialization at all
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
+    if await crud_async.get_archived_at(db, competition_id):
+        # Finished seasons are served read-only from their frozen standings
+        payload = jsonable_encoder(await crud_async.get_archived_leaderboard(db, competition_id))
+    else:
+        payload = await serializers.leaderboard(db, competition_id)
+        if not payload:
+            # Nothing entered yet, or archived since the check above; either way
+            # it's cheap to recompute and mustn't be pinned for the whole TTL
+            payload = jsonable_encoder(await crud_async.get_archived_leaderboard(db, competition_id))
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    if cache is not None and payload:
+        await asyncio.to_thread(cache.set, key, body.decode(), LEADERBOARD_CACHE_TTL_SECONDS)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/competitions/{competition_id}/rank/{portfolio_id}", response_model=schemas.PortfolioRank)
+async def get_portfolio_rank(
+    competition_id: int,
+    portfolio_id: int,
+    k: int = Query(5, ge=0, le=50), # neighbors on each side
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    rank = await crud_async.get_portfolio_rank(db, competition_id=competition_id, portfolio_id=portfolio_id, k=k)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found in competition")
+    return rank
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException
+from typing import Optional
 import yfinance as yf
+import quotes
 
 router = APIRouter()
 
@@ -30,21 +32,51 @@ def search_stocks(query: str):
 
 @router.get("/stocks/price/{symbol}")
 def get_stock_price(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        # fast_info is faster for just price
-        price = ticker.fast_info.last_price
-        previous_close = ticker.fast_info.previous_close
-        
-        change_percent = 0.0
-        if previous_close:
-            change_percent = ((price - previous_close) / previous_close) * 100
-            
-        return {
-            "symbol": symbol, 
-            "price": price, 
-            "change_percent": change_percent
-        }
-    except Exception as e:
-         print(f"Error fetching price for {symbol}: {e}")
-         raise HTTPException(status_code=404, detail="Price not found")
+    quote = quotes.get_quote(symbol)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Price not found")
+
+    return {
+        "symbol": symbol,
+        "price": quote["price"],
+        "change_percent": quote["change_percent"]
+    }
+
+MAX_BATCH_SYMBOLS = 50
+
+@router.get("/stocks/prices")
+def get_stock_prices(symbols: str, fields: Optional[str] = None):
+    # e.g. /stocks/prices?symbols=AAPL,MSFT&fields=price,change_percent
+    requested = []
+    for sym in symbols.split(","):
+        sym = sym.strip().upper()
+        if sym and sym not in requested:
+            requested.append(sym)
+
+    if not requested:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    if len(requested) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Too many symbols (max {MAX_BATCH_SYMBOLS}).")
+
+    selected = quotes.QUOTE_FIELDS
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in quotes.QUOTE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    fetched = quotes.get_quotes(requested)
+
+    results = []
+    missing = []
+    for sym in requested:
+        quote = fetched.get(sym)
+        if quote is None:
+            missing.append(sym)
+            continue
+        entry = {"symbol": sym}
+        for f in selected:
+            entry[f] = quote[f]
+        results.append(entry)
+
+    return {"quotes": results, "missing": missing}
@@ -1,7 +1,9 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-import crud, models, schemas, utils, database
+import crud_async, models, schemas, utils, database, serializers
+from responses import FastJSONResponse
 from utils import verify_password
 # from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 # We will implement full auth logic later, for now just basic user creation
@@ -9,27 +11,27 @@ from utils import verify_password
 router = APIRouter()
 
 @router.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = await crud_async.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    db_user = crud.create_user(db=db, user=user)
+    db_user = await crud_async.create_user(db=db, user=user)
     return db_user
 
 @router.post("/users/login", response_model=schemas.User)
-def login_for_access_token(user_login: schemas.UserLogin, db: Session = Depends(database.get_db)):
-    user = crud.get_user_by_email(db, email=user_login.email)
+async def login_for_access_token(user_login: schemas.UserLogin, db: AsyncSession = Depends(database.get_async_db)):
+    user = await crud_async.get_user_by_email(db, email=user_login.email)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
-    if not verify_password(user_login.password, user.hashed_password):
+    if not await asyncio.to_thread(verify_password, user_login.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
-    return user
+    return FastJSONResponse(await serializers.user_payload(db, user))
 
 @router.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(database.get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+async def read_user(user_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = await crud_async.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return FastJSONResponse(await serializers.user_payload(db, db_user))
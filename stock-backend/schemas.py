@@ -18,6 +18,7 @@ class PortfolioItem(PortfolioItemBase):
 
     class Config:
         orm_mode = True
+        from_attributes = True # pydantic v2 name
 
 class PortfolioBase(BaseModel):
     name: str
@@ -31,9 +32,11 @@ class Competition(BaseModel):
     name: str
     slug: str
     entry_deadline: Optional[datetime]
+    archived_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+        from_attributes = True # pydantic v2 name
 
 class UserPublic(BaseModel):
     id: int
@@ -41,6 +44,7 @@ class UserPublic(BaseModel):
     
     class Config:
         orm_mode = True
+        from_attributes = True # pydantic v2 name
 
 class Portfolio(PortfolioBase):
     id: int
@@ -49,12 +53,14 @@ class Portfolio(PortfolioBase):
     created_at: datetime
     total_value: float
     total_return_percent: float
+    refreshed_at: Optional[datetime] = None
     items: List[PortfolioItem]
     competition: Optional[Competition]
     owner: Optional[UserPublic]
 
     class Config:
         orm_mode = True
+        from_attributes = True # pydantic v2 name
 
 class UserBase(BaseModel):
     email: str
@@ -74,3 +80,21 @@ class User(UserBase):
 
     class Config:
         orm_mode = True
+        from_attributes = True # pydantic v2 name
+
+class RankEntry(BaseModel):
+    rank: int
+    portfolio_id: int
+    name: str
+    owner_id: int
+    username: Optional[str] = None
+    total_value: float
+    total_return_percent: float
+
+class PortfolioRank(BaseModel):
+    competition_id: int
+    portfolio_id: int
+    rank: int
+    total: int
+    percentile: float
+    neighbors: List[RankEntry]
@@ -0,0 +1,148 @@
+"""
+Fast serializers for the large list endpoints.
+
+Builds the schemas.Portfolio / schemas.User JSON shape straight from column
+tuples (one query for portfolios, one for their items) instead of loading ORM
+objects and validating them field by field. Routes return the result wrapped in
+FastJSONResponse, which skips response_model validation.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import crud
+import competition_registry
+
+PORTFOLIO_COLUMNS = (
+    models.Portfolio.id,
+    models.Portfolio.name,
+    models.Portfolio.owner_id,
+    models.Portfolio.competition_id,
+    models.Portfolio.created_at,
+    models.Portfolio.total_value,
+    models.Portfolio.total_return_percent,
+    models.Portfolio.refreshed_at,
+    models.User.username,
+    models.User.id,
+)
+
+ITEM_COLUMNS = (
+    models.PortfolioItem.id,
+    models.PortfolioItem.portfolio_id,
+    models.PortfolioItem.symbol,
+    models.PortfolioItem.asset_type,
+    models.PortfolioItem.quantity,
+    models.PortfolioItem.initial_price,
+    models.PortfolioItem.current_price,
+)
+
+
+def portfolio_select():
+    """Base statement for portfolio rows; callers add filters, ordering and limits."""
+    return select(*PORTFOLIO_COLUMNS).outerjoin(models.User, models.User.id == models.Portfolio.owner_id)
+
+
+def competition_dict(competition):
+    return {
+        "id": competition.id,
+        "name": competition.name,
+        "slug": competition.slug,
+        "entry_deadline": competition.entry_deadline,
+        "archived_at": competition.archived_at,
+    }
+
+
+async def competitions_by_id(db: AsyncSession, competition_ids):
+    """competition_id -> competition_dict, reloading the registry for ids it hasn't seen yet."""
+    def resolve(sync_db):
+        return {cid: competition_registry.get(sync_db, cid) for cid in competition_ids if cid is not None}
+    competitions = await db.run_sync(resolve)
+    return {cid: competition_dict(c) for cid, c in competitions.items() if c is not None}
+
+
+async def portfolios_payload(db: AsyncSession, stmt):
+    """Run a portfolio_select() statement and return schemas.Portfolio-shaped dicts."""
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return []
+
+    items_by_portfolio = {row[0]: [] for row in rows}
+    item_rows = await db.execute(
+        select(*ITEM_COLUMNS)
+        .where(models.PortfolioItem.portfolio_id.in_(list(items_by_portfolio)))
+        .order_by(models.PortfolioItem.id)
+    )
+    for item_id, portfolio_id, symbol, asset_type, quantity, initial_price, current_price in item_rows:
+        items_by_portfolio[portfolio_id].append({
+            "symbol": symbol,
+            "asset_type": asset_type,
+            "quantity": quantity,
+            "id": item_id,
+            "portfolio_id": portfolio_id,
+            "initial_price": initial_price,
+            "current_price": current_price,
+        })
+
+    competitions = await competitions_by_id(db, {row[3] for row in rows})
+
+    return [{
+        "name": name,
+        "id": portfolio_id,
+        "owner_id": owner_id,
+        "competition_id": competition_id,
+        "created_at": created_at,
+        "total_value": total_value,
+        "total_return_percent": total_return_percent,
+        "refreshed_at": refreshed_at,
+        "items": items_by_portfolio[portfolio_id],
+        "competition": competitions.get(competition_id),
+        # Outer join: no user row means no owner, as on the ORM path
+        "owner": {"id": owner_id, "username": username} if user_id is not None else None,
+    } for (portfolio_id, name, owner_id, competition_id, created_at,
+           total_value, total_return_percent, refreshed_at, username, user_id) in rows]
+
+
+async def portfolios_list(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return await portfolios_payload(db, portfolio_select().order_by(models.Portfolio.id).offset(skip).limit(limit))
+
+
+async def leaderboard(db: AsyncSession, competition_id: int, limit: int = 100):
+    return await portfolios_payload(
+        db,
+        portfolio_select()
+        .where(models.Portfolio.competition_id == competition_id)
+        .order_by(models.Portfolio.total_return_percent.desc())
+        .limit(limit)
+    )
+
+
+async def archived_payload(db: AsyncSession, owner_id: int):
+    """schemas.Portfolio-shaped dicts for a user's portfolios in archived competitions."""
+    standings = (await db.execute(
+        select(models.ArchivedStanding).where(models.ArchivedStanding.owner_id == owner_id)
+    )).scalars().all()
+    if not standings:
+        return []
+    # Straight from the table, so archived_at is set even before the registry reloads
+    competition_rows = await db.execute(
+        select(models.Competition)
+        .where(models.Competition.id.in_({s.competition_id for s in standings}))
+    )
+    competitions = {c.id: competition_dict(c) for c in competition_rows.scalars()}
+    return [crud.archived_portfolio(s, competitions.get(s.competition_id)) for s in standings]
+
+
+async def user_payload(db: AsyncSession, user: models.User):
+    """schemas.User-shaped dict for an already-loaded user (portfolios fetched here)."""
+    portfolios = await portfolios_payload(
+        db, portfolio_select().where(models.Portfolio.owner_id == user.id).order_by(models.Portfolio.id)
+    )
+    # Entries in finished competitions live on as frozen standings
+    portfolios += await archived_payload(db, user.id)
+    portfolios.sort(key=lambda p: p["id"])
+    return {
+        "email": user.email,
+        "id": user.id,
+        "username": user.username,
+        "is_active": user.is_active,
+        "portfolios": portfolios,
+    }
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# One SQLite file per host, shared by every uvicorn worker on it.
+# Set SHARED_CACHE=0 to fall back to per-process caching only.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "stock_app_cache.db"))
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE", "1") != "0"
+
+
+class SharedCache:
+    """
+    Small key/value store with TTLs on top of a local SQLite file.
+    Writes are single transactions, so readers in other processes see either the
+    old value or the new one. Any SQLite error is treated as a cache miss.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: autocommit, transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are present and not expired."""
+        if not keys:
+            return {}
+        placeholders = ",".join("?" for _ in keys)
+        try:
+            rows = self._conn().execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed: {e}")
+            return {}
+        return {key: json.loads(value) for key, value in rows}
+
+    def set(self, key: str, value, ttl: float):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values: dict, ttl: float):
+        if not values:
+            return
+        expires_at = time.time() + ttl
+        rows = [(key, json.dumps(value), expires_at) for key, value in values.items()]
+        conn = None
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", rows)
+            # Drop anything that has expired while we hold the write lock anyway
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed: {e}")
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def delete(self, key: str):
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Shared cache delete failed: {e}")
+
+    def acquire_leases(self, keys, ttl: float):
+        """
+        Claim the right to refresh each key for `ttl` seconds. Returns the set of
+        keys this caller won; each key is won by exactly one caller across all
+        workers until its lease expires or is released.
+        """
+        if not keys:
+            return set()
+        now = time.time()
+        conn = None
+        won = set()
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            for key in keys:
+                cur = conn.execute("INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)", (key, now + ttl))
+                if cur.rowcount == 1:
+                    won.add(key)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Shared cache lease failed: {e}")
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Without the shared tier every worker fetches for itself
+            return set(keys)
+        return won
+
+    def release_leases(self, keys):
+        if not keys:
+            return
+        placeholders = ",".join("?" for _ in keys)
+        try:
+            self._conn().execute(f"DELETE FROM leases WHERE key IN ({placeholders})", tuple(keys))
+        except sqlite3.Error as e:
+            print(f"Shared cache lease release failed: {e}")
+
+
+def leaderboard_key(competition_id: int):
+    return f"leaderboard:{competition_id}"
+
+
+def quote_key(symbol: str):
+    return f"quote:{symbol}"
+
+
+def _open_cache():
+    if not SHARED_CACHE_ENABLED:
+        return None
+    try:
+        return SharedCache(SHARED_CACHE_PATH)
+    except sqlite3.Error as e:
+        # Unwritable path, locked file, ...: run with per-process caching only
+        print(f"Shared cache unavailable at {SHARED_CACHE_PATH}: {e}")
+        return None
+
+
+cache = _open_cache()